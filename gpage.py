@@ -190,17 +190,8 @@ def leaderboard():
     results = cache_c.fetchall()
     cache_conn.close()
 
-    # Calculate global statistics from the original blocks database
-    conn = sqlite3.connect('blocks.db', timeout=10)
-    c = conn.cursor()
-    c.execute('''SELECT SUM(attempts) as total_attempts,
-                 strftime('%s', MAX(timestamp)) - strftime('%s', MIN(timestamp)) as total_time
-                 FROM (SELECT * FROM account_attempts ORDER BY timestamp DESC LIMIT 100000)''')
-    result = c.fetchone()
-    total_attempts, total_time = result
-    #total_attempts_per_second = total_attempts / (total_time if total_time != 0 else 1)
+    # Global attempts per second is disabled; /hash_rate still computes it
     total_attempts_per_second = 1
-    conn.close()
 
     # Get the latest rate from the difficulty database
     diff_conn = sqlite3.connect('difficulty.db', timeout=10)
@@ -293,7 +284,7 @@ def hash_rate():
     # Get the sum of all attempts and the time range for the last 10,000 records
     c.execute('''SELECT SUM(attempts) as total_attempts,
                  strftime('%s', MAX(timestamp)) - strftime('%s', MIN(timestamp)) as total_time
-                 FROM (SELECT * FROM account_attempts ORDER BY timestamp DESC LIMIT 50000)''')
+                 FROM (SELECT attempts, timestamp FROM account_attempts ORDER BY timestamp DESC LIMIT 50000)''')
 
     # Rest of your code
     result = c.fetchone()
@@ -34,6 +34,8 @@ def recreate_cache_table():
                 hashes_per_second REAL,
                 super_blocks INTEGER
             )""")
+            # Readers look accounts up case-insensitively via LOWER(account)
+            cache_cursor.execute("CREATE INDEX IF NOT EXISTS idx_cache_table_lower_account ON cache_table(LOWER(account))")
             cache_conn.commit()
 
             # Fetch data from the original database and populate the cache table
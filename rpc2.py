@@ -1,4 +1,5 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, abort
+import os
 import secrets
 import sqlite3
 from ethereum.transactions import Transaction
@@ -7,6 +8,11 @@ import rlp
 from rlp import encode
 from web3 import Web3
 import time
+import queue
+import threading
+import logging
+from collections import OrderedDict
+from functools import lru_cache
 
 from flask_cors import cross_origin
 
@@ -22,9 +28,156 @@ CORS(app)
 def hello_world():
     return 'Hello, World!'
 
+logger = logging.getLogger(__name__)
+# Checked once instead of per call; refreshed when logging is configured below
+DEBUG_RPC = logger.isEnabledFor(logging.DEBUG)
+
+# Token balances are whole units in the database; RPC clients expect wei
+WEI_PER_TOKEN = 10**18
+
+# Default names and symbols for different contracts
+CONTRACT_DATA = {
+    "0x999999cf1046e68e36e1aa2e0e07105eddd00002": {"name": "XUNI Token", "symbol": "XUNI"},
+    "0x999999cf1046e68e36e1aa2e0e07105eddd00001": {"name": "X.BLK Token", "symbol": "X.BLK"}
+}
+
+# Example: Fetch the contract code from your database or some storage.
+# In this example, it's hardcoded.
+CONTRACT_CODE = {
+    '0xdadf7ac7d0622dedd7e58b4d85d3784cc0c9d0e7': '0x606060405260...',
+    '0x999999cf1046e68e36e1aa2e0e07105eddd00002': '0x00002',
+    '0x999999cf1046e68e36e1aa2e0e07105eddd00001': '0x00001'
+}
+
 # Initialize eth_blockNumber
 current_block_number = 0x2234
 
+# Read queries, kept as constants so the statement cache of the pooled
+# connections below can reuse the compiled statements across calls
+SQL_XUNI_COUNT = "SELECT COUNT(*) as n FROM xuni WHERE account = ?"
+SQL_XBLK_COUNT = "SELECT super_blocks FROM cache_table WHERE LOWER(account) = LOWER(?)"
+SQL_TOTAL_BLOCKS = "SELECT total_blocks FROM cache_table WHERE LOWER(account) = ?"
+SQL_TX_BY_HASH = "SELECT from_account, to_account, value FROM transactions WHERE tx_hash=?"
+SQL_NONCE_COUNT = "SELECT COUNT(*) FROM transactions WHERE from_account = ?"
+
+# Read connections per database file. Requests run on their own threads, so
+# each one borrows a connection instead of queueing behind a shared one. Up to
+# DB_POOL_SIZE idle connections are kept; under load up to DB_MAX_OVERFLOW more
+# may be open at once, after which readers wait for one to be returned.
+DB_POOL_SIZE = 8
+DB_MAX_OVERFLOW = 16
+_db_pools = {}
+_db_open = {}
+_db_pool_cond = threading.Condition(threading.Lock())
+
+
+def connect_db(db_path):
+    conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+    # WAL lets these readers run alongside gpage.py and make_cache.py writers
+    conn.execute('PRAGMA journal_mode = wal')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA cache_size = -65536')
+    conn.execute('PRAGMA mmap_size = 268435456')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+
+def acquire_db(db_path):
+    with _db_pool_cond:
+        while True:
+            idle = _db_pools.get(db_path)
+            if idle:
+                return idle.pop()
+            opened = _db_open.get(db_path, 0)
+            if opened < DB_POOL_SIZE + DB_MAX_OVERFLOW:
+                _db_open[db_path] = opened + 1
+                break
+            _db_pool_cond.wait()
+
+    try:
+        return connect_db(db_path)
+    except Exception:
+        with _db_pool_cond:
+            _db_open[db_path] -= 1
+            _db_pool_cond.notify()
+        raise
+
+
+def release_db(db_path, conn):
+    with _db_pool_cond:
+        idle = _db_pools.get(db_path)
+        if idle is None:
+            idle = _db_pools[db_path] = []
+        if len(idle) < DB_POOL_SIZE:
+            idle.append(conn)
+            _db_pool_cond.notify()
+            return
+        _db_open[db_path] -= 1
+        _db_pool_cond.notify()
+    conn.close()
+
+
+def query_one(db_path, sql, params):
+    conn = acquire_db(db_path)
+    try:
+        return conn.execute(sql, params).fetchone()
+    finally:
+        release_db(db_path, conn)
+
+
+def query_all(db_path, sql, params):
+    conn = acquire_db(db_path)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        release_db(db_path, conn)
+
+# Transactions are immutable once inserted, so found receipts can be kept in a
+# small LRU and served without another trip to blocks.db
+_RECEIPT_CACHE_MAX = 512
+_receipt_cache = OrderedDict()
+_receipt_lock = threading.Lock()
+
+# Next nonce per account, kept as a bounded LRU. The transactions table is only
+# written by handle_raw_transaction, which bumps _nonce_generation and drops the
+# sender's entry after each insert; a count read before that bump is not stored.
+_NONCE_CACHE_MAX = 4096
+_nonce_cache = OrderedDict()
+_nonce_generation = 0
+_nonce_lock = threading.Lock()
+
+# cache_table is rebuilt by make_cache.py every few minutes, so balance reads
+# can be served from memory for a short while. Set to 0 to disable.
+CACHE_TABLE_TTL = 5.0
+CACHE_TABLE_MAX = 10000
+_cache_table_rows = {}
+_cache_table_lock = threading.Lock()
+
+
+def _cache_table_get(key):
+    with _cache_table_lock:
+        entry = _cache_table_rows.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() < entry[1]:
+            return entry[0]
+        del _cache_table_rows[key]
+        return None
+
+
+def _cache_table_put(key, value):
+    if CACHE_TABLE_TTL <= 0:
+        return
+    now = time.monotonic()
+    with _cache_table_lock:
+        if len(_cache_table_rows) >= CACHE_TABLE_MAX:
+            # Sweep expired entries first; if that frees nothing, start over
+            for stale in [k for k, entry in _cache_table_rows.items() if entry[1] <= now]:
+                del _cache_table_rows[stale]
+            if len(_cache_table_rows) >= CACHE_TABLE_MAX:
+                _cache_table_rows.clear()
+        _cache_table_rows[key] = (value, now + CACHE_TABLE_TTL)
+
 # Function to fetch balance from SQLite database
 
 def validate_transaction(tx):
@@ -39,17 +192,9 @@ def broadcast_transaction(tx):
 
 
 def get_xuni_account_count(account_name):
-    # Initialize database connection
-    conn = sqlite3.connect('blocks.db')
-    cursor = conn.cursor()
-
     try:
         # Run the SQL query
-        cursor.execute("SELECT COUNT(*) as n FROM xuni WHERE account = ?", (account_name,))
-        data = cursor.fetchone()
-
-        # Close database connection
-        conn.close()
+        data = query_one('blocks.db', SQL_XUNI_COUNT, (account_name,))
 
         # Check if data was found
         if data:
@@ -59,121 +204,135 @@ def get_xuni_account_count(account_name):
 
     except sqlite3.Error as e:
         print("Database error:", e)
-        # Close database connection in case of an error
-        conn.close()
         return -2  # can use -2 or another indicator to show that there was a database error
 
 
 # Function to update the account balances in the super_blocks table
 
 def transfer(from_account, to_account, value):
-    try:
-        conn_cache = sqlite3.connect("cache.db")
-        cursor_cache = conn_cache.cursor()
-
-        conn = sqlite3.connect("blocks.db")
-        cursor = conn.cursor()
-        # Check if the value is negative
-        if value < 0:
-            print("Transfer value cannot be negative.")
-            return
+    # The balance updates below are disabled, so no connection is needed
+    # Check if the value is negative
+    if value < 0:
+        print("Transfer value cannot be negative.")
+        return
 
-        # Debug print
-        print(f"Initiating transfer of {value} from {from_account} to {to_account}")
+    # Debug print
+    print(f"Initiating transfer of {value} from {from_account} to {to_account}")
 
-        # Add '0x' prefix if not present and convert accounts to lower case
-        #from_account = from_account.lower() if from_account.startswith('0x') else '0x' + from_account.lower()
-        #to_account = to_account.lower() if to_account.startswith('0x') else '0x' + to_account.lower()
+    # Add '0x' prefix if not present and convert accounts to lower case
+    #from_account = from_account.lower() if from_account.startswith('0x') else '0x' + from_account.lower()
+    #to_account = to_account.lower() if to_account.startswith('0x') else '0x' + to_account.lower()
 
-        # Check balance of the sender account
-        #cursor.execute("SELECT super_block_count FROM super_blocks WHERE LOWER(account) = ?", (from_account,))
+    # Check balance of the sender account
+    #cursor.execute("SELECT super_block_count FROM super_blocks WHERE LOWER(account) = ?", (from_account,))
 
-        #row = cursor.fetchone()
-        
-        #if row:
-        #    current_balance = row[0]
-        #    if current_balance < value:
-        #        print(f"Insufficient balance in account {from_account}. Transfer aborted.")
-        #        return
-        #else:
-        #    print(f"Account {from_account} not found. Transfer aborted.")
-        #    return
-
-        # Deduct the value from the sender account
-        #cursor.execute("""
-        #    UPDATE super_blocks
-        #    SET super_block_count = super_block_count - ?
-        #    WHERE LOWER(account) = ?;
-        #""", (value, from_account))
-
-        #affected_rows = cursor.rowcount
-        #print(f"Deducted {value} from {from_account}. Rows affected: {affected_rows}")
-
-        # Add the value to the receiver account
-        #cursor.execute("""
-        #    UPDATE super_blocks
-        #    SET super_block_count = super_block_count + ?
-        #    WHERE LOWER(account) = ?;
-        #""", (value, to_account))
-
-        #if cursor.rowcount == 0:
-            #print(f"Account {to_account} not found. Inserting a new row.")
-            #cursor.execute("INSERT INTO super_blocks (account, super_block_count) VALUES (?, ?)", (to_account, value))
-
-        # Commit and close
-        #conn.commit()
-        conn.close()
-
-    except sqlite3.Error as e:
-        print("SQLite error occurred:", e)
-        if conn:
-            conn.rollback()
-            print("Transaction rolled back.")
-        raise
+    #row = cursor.fetchone()
+    
+    #if row:
+    #    current_balance = row[0]
+    #    if current_balance < value:
+    #        print(f"Insufficient balance in account {from_account}. Transfer aborted.")
+    #        return
+    #else:
+    #    print(f"Account {from_account} not found. Transfer aborted.")
+    #    return
+
+    # Deduct the value from the sender account
+    #cursor.execute("""
+    #    UPDATE super_blocks
+    #    SET super_block_count = super_block_count - ?
+    #    WHERE LOWER(account) = ?;
+    #""", (value, from_account))
+
+    #affected_rows = cursor.rowcount
+    #print(f"Deducted {value} from {from_account}. Rows affected: {affected_rows}")
+
+    # Add the value to the receiver account
+    #cursor.execute("""
+    #    UPDATE super_blocks
+    #    SET super_block_count = super_block_count + ?
+    #    WHERE LOWER(account) = ?;
+    #""", (value, to_account))
+
+    #if cursor.rowcount == 0:
+        #print(f"Account {to_account} not found. Inserting a new row.")
+        #cursor.execute("INSERT INTO super_blocks (account, super_block_count) VALUES (?, ?)", (to_account, value))
+
+    # Commit and close
+    #conn.commit()
 
 
 def get_xblk_account_count(account):
+    if not is_hex_of_length(account, 40):
+        return 0
 
-    try:
-
-        conn = sqlite3.connect("cache.db")
-        cursor_cache = conn.cursor()
+    key = ('super_blocks', account.lower())
+    cached = _cache_table_get(key)
+    if cached is not None:
+        return cached
 
-        cursor_cache.execute("SELECT super_blocks FROM cache_table WHERE LOWER(account) = LOWER(?)", (account,))
-        print ("Account: ", account)
-        row = cursor_cache.fetchone()
-        return row[0] if row else 0
+    try:
+        row = query_one('cache.db', SQL_XBLK_COUNT, (account,))
+        if DEBUG_RPC:
+            logger.debug("Account: %s", account)
+        count = row[0] if row else 0
+        _cache_table_put(key, count)
+        return count
     except Exception as e:
         print("Database error:", e)
         return 0
-    finally:
-        if conn:
-            conn.close()
 
 
 def get_balance_from_db(account):
-    try:
-        conn = sqlite3.connect("blocks.db")
-        cursor = conn.cursor()
+    if not is_hex_of_length(account, 40):
+        return 0
 
-        conn_cache = sqlite3.connect("cache.db")
-        cursor_cache = conn_cache.cursor()
+    key = ('total_blocks', account.lower())
+    cached = _cache_table_get(key)
+    if cached is not None:
+        return cached
 
-        query = "SELECT super_block_count FROM super_blocks WHERE LOWER(account) = LOWER(?)"
+    try:
         #print(f"Executing SQL query: {query} with account: {account}")  # Print the query and account to standard output
         #cursor.execute("SELECT super_block_count FROM super_blocks WHERE LOWER(account) = LOWER(?)", (account,))
-        print ("Account: ", account)
-        cursor_cache.execute("SELECT total_blocks FROM cache_table WHERE LOWER(account) = ?", (account.lower(),))
-        row = cursor_cache.fetchone()
-        print ("Balance for ", account, row[0] * 10 if row else 0)  # Modified this line to handle None
-        return row[0] * 10 if row else 0
+        if DEBUG_RPC:
+            logger.debug("Account: %s", account)
+        row = query_one('cache.db', SQL_TOTAL_BLOCKS, (account.lower(),))
+        balance = row[0] * 10 if row else 0
+        if DEBUG_RPC:
+            logger.debug("Balance for %s %s", account, balance)
+        _cache_table_put(key, balance)
+        return balance
     except Exception as e:
         print("Database error:", e)
         return 0
-    finally:
-        if conn:
-            conn.close()
-            conn_cache.close()
+
+def prefetch_balances(accounts):
+    if CACHE_TABLE_TTL <= 0:
+        return
+    pending = list({account.lower() for account in accounts
+                    if is_hex_of_length(account, 40) and _cache_table_get(('total_blocks', account.lower())) is None})
+    # Stay well under SQLite's bound parameter limit
+    for start in range(0, len(pending), 500):
+        chunk = pending[start:start + 500]
+        placeholders = ','.join('?' * len(chunk))
+        try:
+            rows = query_all('cache.db', f"SELECT LOWER(account), total_blocks FROM cache_table WHERE LOWER(account) IN ({placeholders})", chunk)
+        except Exception as e:
+            print("Database error:", e)
+            return
+        found = dict(rows)
+        for account in chunk:
+            _cache_table_put(('total_blocks', account), found.get(account, 0) * 10)
+
+# Only a handful of token names and symbols exist, so their ABI encodings are
+# computed once and reused by every name()/symbol() eth_call
+@lru_cache(maxsize=64)
+def abi_encode_string(value):
+    length_in_hex = hex(len(value))[2:].zfill(64)
+    encoded_value = value.encode().hex().ljust(64, '0')
+    return '0x' + '0000000000000000000000000000000000000000000000000000000000000020' + length_in_hex + encoded_value
+
 
 def rlp_encode(input_string):
     if len(input_string) == 1 and ord(input_string) < 0x80:
@@ -187,25 +346,21 @@ def rlp_encode(input_string):
 
 
 def handle_eth_call(data):
-    print("In handle_eth_call function: ", data)
+    if DEBUG_RPC:
+        logger.debug("In handle_eth_call function: %s", data)
     
     # Check if 'data' key exists
     if 'params' not in data or not isinstance(data['params'], list) or len(data['params']) == 0 or 'data' not in data['params'][0]:
-        print ("Data missing: ", data)
+        if DEBUG_RPC:
+            logger.debug("Data missing: %s", data)
         response = "0x123456"
         return response
 
     # Extracting the relevant details from the data
     target_address = data['params'][0]['to'].lower()
 
-    # Default names and symbols for different contracts
-    contract_data = {
-        "0x999999cf1046e68e36e1aa2e0e07105eddd00002": {"name": "XUNI Token", "symbol": "XUNI"},
-        "0x999999cf1046e68e36e1aa2e0e07105eddd00001": {"name": "X.BLK Token", "symbol": "X.BLK"}
-    }
-
     # If the contract address is not recognized
-    if target_address not in contract_data:
+    if target_address not in CONTRACT_DATA:
         return {
             "id": data['id'],
             "jsonrpc": "2.0",
@@ -218,42 +373,45 @@ def handle_eth_call(data):
     function_data = data['params'][0]['data']
     function_signature = function_data[:10]
     address_queried = function_data[10:74]
-    print(f"Function Signature: {function_signature}")
+    if DEBUG_RPC:
+        logger.debug("Function Signature: %s", function_signature)
 
     if function_signature == '0x313ce567':  # decimals function
-        print("RETURN DECIMALS")
+        if DEBUG_RPC:
+            logger.debug("RETURN DECIMALS")
         decimals = 18
         response = '0x' + hex(decimals)[2:].zfill(64)
 
     elif function_signature == '0x06fdde03':  # name function
-        token_name = contract_data[target_address]["name"]
-        length_in_hex = hex(len(token_name))[2:].zfill(64)
-        encoded_name = token_name.encode().hex().ljust(64, '0')
-        response = '0x' + '0000000000000000000000000000000000000000000000000000000000000020' + length_in_hex + encoded_name
-        print("RETURN NAME: ", token_name)
+        token_name = CONTRACT_DATA[target_address]["name"]
+        response = abi_encode_string(token_name)
+        if DEBUG_RPC:
+            logger.debug("RETURN NAME: %s", token_name)
 
     elif function_signature == '0x95d89b41':  # symbol function
-        symbol = contract_data[target_address]["symbol"]
-        length_in_hex = hex(len(symbol))[2:].zfill(64)
-        encoded_symbol = symbol.encode().hex().ljust(64, '0')
-        response = '0x' + '0000000000000000000000000000000000000000000000000000000000000020' + length_in_hex + encoded_symbol
-        print("RETURN SYMBOL: ", symbol)
+        symbol = CONTRACT_DATA[target_address]["symbol"]
+        response = abi_encode_string(symbol)
+        if DEBUG_RPC:
+            logger.debug("RETURN SYMBOL: %s", symbol)
 
     elif function_signature == '0x70a08231':  # balanceOf function
         address_queried = function_data[34:74].lower()
 
         # Depending on the target address, call the appropriate function to get the balance
-        if target_address == "0x999999cf1046e68e36e1aa2e0e07105eddd00002":
-            balance = get_xuni_account_count('0x' + address_queried) * 1000000000000000000
+        if not is_hex_of_length(address_queried, 40):
+            balance = 0
+        elif target_address == "0x999999cf1046e68e36e1aa2e0e07105eddd00002":
+            balance = get_xuni_account_count('0x' + address_queried) * WEI_PER_TOKEN
         elif target_address == "0x999999cf1046e68e36e1aa2e0e07105eddd00001":
-            balance = get_xblk_account_count('0x' + address_queried) * 1000000000000000000
+            balance = get_xblk_account_count('0x' + address_queried) * WEI_PER_TOKEN
         else:
             # Handle unknown contract address or give a default balance
             balance = 0
 
-        response = '0x' + hex(balance)[2:].zfill(64)
-        print("RETURN BALANCE for: ", address_queried)
-        print("BALANCE is: ", balance)
+        response = '0x' + format(balance, '064x')
+        if DEBUG_RPC:
+            logger.debug("RETURN BALANCE for: %s", address_queried)
+            logger.debug("BALANCE is: %s", balance)
 
 
     else:
@@ -266,19 +424,22 @@ def handle_eth_call(data):
             }
         }
 
-    print(response)
+    if DEBUG_RPC:
+        logger.debug("%s", response)
     return response
 
 
 def handle_eth_call2(data):
-    print("In handle_eth_call functioni:  ", data)
+    if DEBUG_RPC:
+        logger.debug("In handle_eth_call functioni: %s", data)
 
     # Initialize the response to None
     response = None
 
     # Check if 'data' key exists
     if 'params' not in data or not isinstance(data['params'], list) or len(data['params']) == 0 or 'data' not in data['params'][0]:
-        print ("Data missing: ", data)
+        if DEBUG_RPC:
+            logger.debug("Data missing: %s", data)
         return {
             "id": data['id'],
             "jsonrpc": "2.0",
@@ -302,7 +463,8 @@ def handle_eth_call2(data):
     function_data = data['params'][0]['data']
     function_signature = function_data[:10]
     address = function_data[10:74]
-    print(f"Function Signature: {function_signature}")
+    if DEBUG_RPC:
+        logger.debug("Function Signature: %s", function_signature)
 
     if function_signature == '0x313ce567':
         # decimals function
@@ -323,15 +485,39 @@ def handle_eth_call2(data):
 @cross_origin()
 def index():
     data = request.get_json()
-    global current_block_number
-    print("Received data:", data)  # Print received queries to the screen
+    if DEBUG_RPC:
+        logger.debug("Received data: %s", data)
     if not data:
         abort(400, description="No data provided")
 
-    if data['jsonrpc'] != '2.0':
+    # JSON-RPC batch: look up every eth_getBalance account in one query up front
+    if isinstance(data, list):
+        prefetch_balances([item['params'][0] for item in data
+                           if isinstance(item, dict) and item.get('method') == 'eth_getBalance'
+                           and isinstance(item.get('params'), list) and item['params']])
+        return jsonify([handle_batch_item(item) for item in data])
+
+    response, status = handle_request(data)
+    return jsonify(response), status
+
+
+def handle_batch_item(item):
+    # One bad entry must not fail the rest of the batch
+    try:
+        return handle_request(item)[0]
+    except Exception as e:
+        print("Error handling batch item:", e)
+        return {'jsonrpc': '2.0', 'error': {'code': -32603, 'message': 'Internal error'}, 'id': item.get('id', None)}
+
+
+def handle_request(data):
+    global current_block_number
+
+    if not isinstance(data, dict) or data.get('jsonrpc') != '2.0' or not isinstance(data.get('method'), str):
         response = {'jsonrpc': '2.0', 'error': {'code': -32600, 'message': 'Invalid Request'}, 'id': None}
-        print("Sending response:", response)  # Print response to the screen
-        return jsonify(response), 400
+        if DEBUG_RPC:
+            logger.debug("Sending response: %s", response)
+        return response, 400
 
     # Initialize the result variable
     result = None
@@ -346,13 +532,14 @@ def index():
             'result': result
         }
 
-        print("Sending response:", response)  # Print response to the screen
-        return jsonify(response)
+        if DEBUG_RPC:
+            logger.debug("Sending response: %s", response)
+        return response, 200
 
     elif data['method'] == 'eth_getBalance':
         account = data['params'][0]  # Convert account to lower case to ensure it matches
         balance_decimal = get_balance_from_db(account)  # Fetch balance from the database
-        result = hex(int(balance_decimal * 10**18))  # Convert to Wei
+        result = hex(balance_decimal * WEI_PER_TOKEN)  # Convert to Wei
 
     elif data['method'] == 'eth_estimateGas':
         # Simulate gas estimation here. This is a simplified example and
@@ -364,8 +551,8 @@ def index():
     #    result = '0x123456'
     
     elif data['method'] == 'eth_call':
-        print ("ETH CALL RECEIVED: ")
-        print (data)
+        if DEBUG_RPC:
+            logger.debug("ETH CALL RECEIVED: %s", data)
         result = handle_eth_call(data)
     
     elif data['method'] == 'eth_chainId':
@@ -375,52 +562,24 @@ def index():
         address = data['params'][0].lower()  # Convert the address to lower case
         block_number = data['params'][1]  # The block number or tag; you may or may not use this depending on your implementation
 
-        # Example: Fetch the contract code from your database or some storage.
-        # In this example, it's hardcoded.
-        contract_code = {
-            '0xdadf7ac7d0622dedd7e58b4d85d3784cc0c9d0e7': '0x606060405260...',
-            '0x999999cf1046e68e36e1aa2e0e07105eddd00002': '0x00002',
-            '0x999999cf1046e68e36e1aa2e0e07105eddd00001': '0x00001'
-        }
-
-        result = contract_code.get(address, '0x')  # return '0x' if the address is not a contract
+        result = CONTRACT_CODE.get(address, '0x')  # return '0x' if the address is not a contract
 
     elif data['method'] == 'eth_getTransactionReceipt':
         tx_hash = data['params'][0]
-        print("Entering eth_getTransactionReceipt")
-
-        # Connect to SQLite database
-        conn = sqlite3.connect('blocks.db')
-        cursor = conn.cursor()
+        if DEBUG_RPC:
+            logger.debug("Entering eth_getTransactionReceipt")
 
-        # Query the transactions table
-        cursor.execute("SELECT from_account, to_account, value FROM transactions WHERE tx_hash=?", (tx_hash,))
-        row = cursor.fetchone()
+        row = get_transaction_row(tx_hash)
 
         if row:
-            from_account, to_account, value = row
-
-            # Populate receipt with database values
-            receipt = {
-                'transactionHash': tx_hash,
-                'transactionIndex': '0x1',
-                'blockHash': '0x' + secrets.token_hex(32),
-                'blockNumber': '0x6',
-                'from': from_account,
-                'to': to_account,
-                'cumulativeGasUsed': '0xA',
-                'gasUsed': '0xA',
-                'contractAddress': None,
-                'logs': [],
-                'status': '0x1'
-            }
-            print("Sending: ", receipt)
+            receipt = build_receipt(tx_hash, row)
+            if DEBUG_RPC:
+                logger.debug("Sending: %s", receipt)
             result = receipt
 
         else:
-            print(f"No transaction found for hash {tx_hash}")
-
-        conn.close()
+            if DEBUG_RPC:
+                logger.debug("No transaction found for hash %s", tx_hash)
 
     elif data['method'] == 'eth_getTransactionCount':
         address = data['params'][0].lower()
@@ -428,10 +587,12 @@ def index():
 
         # Fetch the nonce from your database using the get_nonce function
         nonce = get_nonce(address)
-        print ("Returning nonce: ", nonce)
+        if DEBUG_RPC:
+            logger.debug("Returning nonce: %s", nonce)
         result = hex(nonce)
         
-        print ("Returning nonce hex: ", result)
+        if DEBUG_RPC:
+            logger.debug("Returning nonce hex: %s", result)
 
     elif data['method'] == '1eth_getTransactionCount':
         address = data['params'][0].lower()
@@ -443,7 +604,8 @@ def index():
             "0xc855fd5aa2829799dde83b43ac33651e46f610bb": 10
         }
         result = hex(nonces.get(address, 0))
-        print ("Returning nonce hex: ", result)
+        if DEBUG_RPC:
+            logger.debug("Returning nonce hex: %s", result)
 
     
     elif data['method'] == 'Xeth_getBlockByNumber':
@@ -454,7 +616,8 @@ def index():
         }
 
     elif data['method'] == 'eth_getBlockByNumber':
-        print("RETURN BLOCK DATA")
+        if DEBUG_RPC:
+            logger.debug("RETURN BLOCK DATA")
         requested_block_number = data['params'][0]
         current_timestamp = int(time.time())  # Assuming you've imported the time module
 
@@ -509,21 +672,21 @@ def index():
         raw_tx = data['params'][0]
         print("Raw TX: ", raw_tx)
         try:
-            handle_raw_transaction(raw_tx)
             #tx_hash = broadcast_transaction(raw_tx)
-            tx_hash = get_transaction_hash(raw_tx)
+            tx_hash = handle_raw_transaction(raw_tx)
             print ("Returning results from eth_sendRawTransaction ", tx_hash)
             result = tx_hash
         except Exception as e:
             result = {'jsonrpc': '2.0', 'error': {'code': -32000, 'message': f'Exception: {e}'}, 'id': data['id']}
             print("Sending response:", result)  # Print response to the screen
-            return result
+            return result, 200
 
  
     else:
         response = {'jsonrpc': '2.0', 'error': {'code': -32601, 'message': 'Method not found'}, 'id': data.get('id', None)}
-        print("Sending response:", response)  # Print response to the screen
-        return jsonify(response), 400
+        if DEBUG_RPC:
+            logger.debug("Sending response: %s", response)
+        return response, 400
     
     response = {
         'jsonrpc': '2.0',
@@ -531,8 +694,9 @@ def index():
         'result': result
     }
 
-    print("Sending Final response:", response)  # Print response to the screen
-    return jsonify(response)
+    if DEBUG_RPC:
+        logger.debug("Sending Final response: %s", response)
+    return response, 200
 
 
 def broadcast_transaction(raw_tx):
@@ -557,36 +721,112 @@ def get_recovered_address(raw_tx):
         return None
 
 
+def get_transaction_row(tx_hash):
+    if not is_hex_of_length(tx_hash, 64):
+        return None
+
+    with _receipt_lock:
+        row = _receipt_cache.get(tx_hash)
+        if row is not None:
+            _receipt_cache.move_to_end(tx_hash)
+            return row
+
+    row = query_one('blocks.db', SQL_TX_BY_HASH, (tx_hash,))
+
+    # Only cache hits; a pending hash may still show up later
+    if row:
+        with _receipt_lock:
+            _receipt_cache[tx_hash] = row
+            if len(_receipt_cache) > _RECEIPT_CACHE_MAX:
+                _receipt_cache.popitem(last=False)
+    return row
+
+
+def build_receipt(tx_hash, row):
+    # Populate receipt with database values
+    from_account, to_account, value = row
+    return {
+        'transactionHash': tx_hash,
+        'transactionIndex': '0x1',
+        'blockHash': '0x' + secrets.token_hex(32),
+        'blockNumber': '0x6',
+        'from': from_account,
+        'to': to_account,
+        'cumulativeGasUsed': '0xA',
+        'gasUsed': '0xA',
+        'contractAddress': None,
+        'logs': [],
+        'status': '0x1'
+    }
+
+
 def get_nonce(from_account):
-    conn = sqlite3.connect('blocks.db')
-    cursor = conn.cursor()
+    if not is_hex_of_length(from_account, 40):
+        return 0
+
+    with _nonce_lock:
+        nonce = _nonce_cache.get(from_account)
+        if nonce is not None:
+            _nonce_cache.move_to_end(from_account)
+            return nonce
+        generation = _nonce_generation
+
     # Count the number of transactions for the from_account
-    cursor.execute("SELECT COUNT(*) FROM transactions WHERE from_account = ?", (from_account,))
-    count = cursor.fetchone()[0]
+    count = query_one('blocks.db', SQL_NONCE_COUNT, (from_account,))[0]
     
     # If there's at least one transaction, increment the count to get the next nonce.
     # If there are no transactions, the count will be 0 and that's the nonce you'll use.
-    return count + 1 if count else 0
+    nonce = count + 1 if count else 0
+    with _nonce_lock:
+        # Skip caching if an insert landed while we were counting
+        if generation == _nonce_generation:
+            _nonce_cache[from_account] = nonce
+            if len(_nonce_cache) > _NONCE_CACHE_MAX:
+                _nonce_cache.popitem(last=False)
+    return nonce
+
+
+def on_transaction_inserted(from_account):
+    # Nonces only change when this process inserts a transaction
+    global _nonce_generation
+    with _nonce_lock:
+        _nonce_generation += 1
+        _nonce_cache.pop(from_account, None)
+        _nonce_cache.pop(from_account.lower(), None)
 
 
-def get_transaction_hash(raw_tx):
-    return Web3.keccak(hexstr=raw_tx).hex()
+def strip_0x(value):
+    return value[2:] if value.startswith(('0x', '0X')) else value
+
+
+HEX_CHARS = frozenset('0123456789abcdefABCDEF')
+
+
+def is_hex_of_length(value, length):
+    # Cheap check so malformed hashes and addresses never reach the database
+    if not isinstance(value, str):
+        return False
+    digits = strip_0x(value)
+    return len(digits) == length and all(c in HEX_CHARS for c in digits)
+
 
 def handle_raw_transaction(raw_tx):
+    # Decode the hex once and reuse the bytes for the hash, rlp and recovery.
+    # A malformed hex string raises here so the caller can report it.
+    raw_bytes = bytes.fromhex(strip_0x(raw_tx))
+    tx_hash = Web3.keccak(raw_bytes).hex()
+    print ("TX hash: ", tx_hash)
+
     # Decode the raw transaction
     conn = sqlite3.connect('blocks.db')
     c = conn.cursor()
 
     try:
-        # Decoding the hex-encoded transaction
-        decoded_tx = rlp.decode(bytes.fromhex(raw_tx[2:]), Transaction)
+        decoded_tx = rlp.decode(raw_bytes, Transaction)
 
         #tx_hash = "0x" + decoded_tx.hash().hex()
         #tx_hash = broadcast_transaction(raw_tx)
 
-        tx_hash = get_transaction_hash(raw_tx) 
-        print ("TX hash: ", tx_hash)
-
         # Extract details
         from_account = decoded_tx.sender  # Or use another way to get sender address
         to_account = decoded_tx.to
@@ -596,7 +836,7 @@ def handle_raw_transaction(raw_tx):
         nonce = decoded_tx.nonce
         input_data = decoded_tx.data
         # Validate from address
-        validated_from = get_recovered_address(raw_tx)
+        validated_from = get_recovered_address(raw_bytes)
 
         from_account = validated_from
 
@@ -613,6 +853,7 @@ def handle_raw_transaction(raw_tx):
         conn.commit()
         # Close the connection
         conn.close()
+        on_transaction_inserted(from_account)
 
         transfer (validated_from, to_account.hex(), value/1e18)
 
@@ -629,5 +870,25 @@ def handle_raw_transaction(raw_tx):
     except Exception as e:
         print(f"An error occurred: {e}")
 
+    return tx_hash
+
+def ensure_indexes():
+    # Receipt, nonce and XUNI lookups all filter on these columns
+    conn = sqlite3.connect('blocks.db')
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS idx_transactions_tx_hash ON transactions(tx_hash)",
+        "CREATE INDEX IF NOT EXISTS idx_transactions_from_account ON transactions(from_account)",
+        "CREATE INDEX IF NOT EXISTS idx_xuni_account ON xuni(account)",
+    ):
+        try:
+            conn.execute(statement)
+        except sqlite3.OperationalError as e:
+            print("Could not create index:", e)
+    conn.commit()
+    conn.close()
+
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG if os.environ.get('RPC_DEBUG') else logging.INFO)
+    DEBUG_RPC = logger.isEnabledFor(logging.DEBUG)
+    ensure_indexes()
     app.run(host='0.0.0.0', port=5555, debug=True)
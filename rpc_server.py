@@ -272,11 +272,15 @@ def get_recovered_address(raw_tx):
         return None
 
 
+def strip_0x(value):
+    return value[2:] if value.startswith(('0x', '0X')) else value
+
+
 def handle_raw_transaction(raw_tx):
     # Decode the raw transaction
     try:
         # Decoding the hex-encoded transaction
-        decoded_tx = rlp.decode(bytes.fromhex(raw_tx[2:]), Transaction)
+        decoded_tx = rlp.decode(bytes.fromhex(strip_0x(raw_tx)), Transaction)
 
         # Extract details
         from_account = decoded_tx.sender  # Or use another way to get sender address
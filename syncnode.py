@@ -87,11 +87,12 @@ def get_total_blocks():
 def verify_block_hashes():
     conn = sqlite3.connect('blockchain.db')
     c = conn.cursor()
-    c.execute('SELECT id, timestamp, prev_hash, merkle_root, block_hash, records_json FROM blockchain ORDER BY id')
+    c.execute('SELECT id, prev_hash, merkle_root, block_hash, records_json FROM blockchain ORDER BY id')
 
     prev_hash = 'genesis'  # Initialize with genesis hash
-    for row in c.fetchall():
-        id, timestamp, prev_hash_db, merkle_root, block_hash, records_json = row
+    # Stream rows so only one block's records_json is held in memory at a time
+    for row in c:
+        id, prev_hash_db, merkle_root, block_hash, records_json = row
 
         # Verify block hash
         block_contents = str(prev_hash) + str(merkle_root)
@@ -163,10 +164,10 @@ c.execute('''CREATE TABLE IF NOT EXISTS blockchain (
                     merkle_root TEXT,
                     records_json TEXT,
                     block_hash TEXT)''')
-# Fetch the latest block ID from the blockchain
-c.execute('SELECT MAX(id) FROM blockchain')
-row = c.fetchone()
-last_block_id = row[0] if row and row[0] is not None else 0
+# Fetch the tip (latest block ID and block_hash) from the blockchain in one lookup
+c.execute('SELECT id, block_hash FROM blockchain ORDER BY id DESC LIMIT 1')
+tip = c.fetchone()
+last_block_id = tip[0] if tip else 0
 print ("Last fetched block ID from blockchain: ", last_block_id)
 
 # Get the total blocks from the API
@@ -187,10 +188,8 @@ else:
     print("Number of records to fetch:", num_to_fetch)
     print("End block ID:", end_block_id)
 
-# Fetch the latest block_hash from the blockchain
-c.execute('SELECT block_hash FROM blockchain ORDER BY id DESC LIMIT 1')
-row = c.fetchone()
-prev_hash = row[0] if row else 'genesis'
+# Continue from the latest block_hash fetched with the tip above
+prev_hash = tip[1] if tip else 'genesis'
 print ("Found previous record in blockchain, continuing with hash: ", prev_hash)
 
 
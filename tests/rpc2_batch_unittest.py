@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# rpc2 needs the full RPC server stack (flask, web3, pyethereum). pyethereum
+# often fails to build; to run these tests without it, put a stub `ethereum`
+# package providing transactions.Transaction and utils.decode_hex on PYTHONPATH.
+RPC2_IMPORT_ERROR = None
+try:
+    import rpc2
+except ImportError as e:
+    rpc2 = None
+    RPC2_IMPORT_ERROR = str(e)
+
+ACCOUNT = '0x' + 'ab' * 20
+
+
+@unittest.skipIf(rpc2 is None, "rpc2 dependencies not installed: %s" % RPC2_IMPORT_ERROR)
+class TestBatchRequests(unittest.TestCase):
+
+    def setUp(self):
+        self.old_cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+
+        conn = sqlite3.connect('cache.db')
+        conn.execute('CREATE TABLE cache_table (account TEXT PRIMARY KEY, total_blocks INTEGER, hashes_per_second REAL, super_blocks INTEGER)')
+        conn.execute('INSERT INTO cache_table VALUES (?, ?, ?, ?)', (ACCOUNT, 12, 100000, 0))
+        conn.commit()
+        conn.close()
+
+        rpc2._cache_table_rows.clear()
+        rpc2._db_pools.clear()
+        rpc2._db_open.clear()
+        self.client = rpc2.app.test_client()
+
+    def tearDown(self):
+        for idle in rpc2._db_pools.values():
+            for conn in idle:
+                conn.close()
+        rpc2._db_pools.clear()
+        rpc2._db_open.clear()
+        os.chdir(self.old_cwd)
+        self.tmp_dir.cleanup()
+
+    def test_mixed_valid_and_invalid_batch(self):
+        batch = [
+            {'jsonrpc': '2.0', 'method': 'eth_getBalance', 'params': [ACCOUNT, 'latest'], 'id': 1},
+            5,
+            {'jsonrpc': '2.0', 'id': 3},
+            {'jsonrpc': '2.0', 'method': 'eth_getBalance', 'params': {'a': 1}, 'id': 4},
+            {'jsonrpc': '2.0', 'method': 'eth_chainId', 'id': 5},
+        ]
+        response = self.client.post('/', json=batch)
+
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()
+        self.assertEqual(len(results), len(batch))
+
+        self.assertEqual(results[0]['id'], 1)
+        self.assertEqual(results[0]['result'], hex(12 * 10 * rpc2.WEI_PER_TOKEN))
+        self.assertEqual(results[1]['error']['code'], -32600)
+        self.assertEqual(results[2]['error']['code'], -32600)
+        self.assertEqual(results[3]['id'], 4)
+        self.assertIn('error', results[3])
+        self.assertEqual(results[4]['result'], '0x18705')
+
+    def test_batch_prefetch_seeds_balance_cache(self):
+        batch = [{'jsonrpc': '2.0', 'method': 'eth_getBalance', 'params': [ACCOUNT, 'latest'], 'id': 1}]
+        self.client.post('/', json=batch)
+        self.assertEqual(rpc2._cache_table_get(('total_blocks', ACCOUNT)), 120)
+
+
+if __name__ == '__main__':
+    unittest.main()
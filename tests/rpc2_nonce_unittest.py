@@ -0,0 +1,91 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# rpc2 needs the full RPC server stack (flask, web3, pyethereum). pyethereum
+# often fails to build; to run these tests without it, put a stub `ethereum`
+# package providing transactions.Transaction and utils.decode_hex on PYTHONPATH.
+RPC2_IMPORT_ERROR = None
+try:
+    import rpc2
+except ImportError as e:
+    rpc2 = None
+    RPC2_IMPORT_ERROR = str(e)
+
+ACCOUNT = '0x' + 'cd' * 20
+
+
+@unittest.skipIf(rpc2 is None, "rpc2 dependencies not installed: %s" % RPC2_IMPORT_ERROR)
+class TestNonceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.old_cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+
+        conn = sqlite3.connect('blocks.db')
+        conn.execute('CREATE TABLE transactions (tx_hash TEXT, raw_tx TEXT, from_account TEXT, to_account TEXT, value INTEGER, nonce INTEGER)')
+        conn.commit()
+        conn.close()
+        self.insert_transaction('0x01')
+
+        rpc2._nonce_cache.clear()
+        rpc2._db_pools.clear()
+        rpc2._db_open.clear()
+
+    def tearDown(self):
+        for idle in rpc2._db_pools.values():
+            for conn in idle:
+                conn.close()
+        rpc2._db_pools.clear()
+        rpc2._db_open.clear()
+        os.chdir(self.old_cwd)
+        self.tmp_dir.cleanup()
+
+    def insert_transaction(self, tx_hash):
+        conn = sqlite3.connect('blocks.db')
+        conn.execute('INSERT INTO transactions (tx_hash, raw_tx, from_account, to_account, value, nonce) VALUES (?, ?, ?, ?, ?, ?)',
+                     (tx_hash, '0x', ACCOUNT, ACCOUNT, 1, 0))
+        conn.commit()
+        conn.close()
+
+    def test_insert_invalidates_cached_nonce(self):
+        self.assertEqual(rpc2.get_nonce(ACCOUNT), 2)
+        self.assertEqual(rpc2._nonce_cache[ACCOUNT], 2)
+
+        # Served from the cache until the insert is announced
+        self.insert_transaction('0x02')
+        self.assertEqual(rpc2.get_nonce(ACCOUNT), 2)
+
+        rpc2.on_transaction_inserted(ACCOUNT)
+        self.assertNotIn(ACCOUNT, rpc2._nonce_cache)
+        self.assertEqual(rpc2.get_nonce(ACCOUNT), 3)
+
+    def test_count_read_before_insert_is_not_cached(self):
+        query_one = rpc2.query_one
+
+        def query_then_insert(db_path, sql, params):
+            # The count is read, then another request inserts and bumps the generation
+            row = query_one(db_path, sql, params)
+            self.insert_transaction('0x02')
+            rpc2.on_transaction_inserted(ACCOUNT)
+            return row
+
+        with mock.patch.object(rpc2, 'query_one', side_effect=query_then_insert):
+            self.assertEqual(rpc2.get_nonce(ACCOUNT), 2)
+
+        self.assertNotIn(ACCOUNT, rpc2._nonce_cache)
+        self.assertEqual(rpc2.get_nonce(ACCOUNT), 3)
+
+    def test_malformed_address_skips_cache(self):
+        self.assertEqual(rpc2.get_nonce('0x1234'), 0)
+        self.assertNotIn('0x1234', rpc2._nonce_cache)
+
+
+if __name__ == '__main__':
+    unittest.main()